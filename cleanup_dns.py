@@ -2,10 +2,141 @@
 """
 Cleanup script to remove duplicate or old DNS records
 """
+from collections import defaultdict
 from config import ConfigManager
 from vultr_api import VultrAPIClient
 import sys
 
+# Record types where more than one record per name is a leftover, not intentional
+DEDUP_TYPES = ('A', 'AAAA')
+
+
+def widened(name):
+    """Yield a name and each of its parent names: 'a.b.c' -> 'a.b.c', 'b.c', 'c'"""
+    while name:
+        yield name
+        name = name.partition('.')[-1]
+
+
+def find_wildcard_shadowed(records, records_per_name):
+    """
+    Find records that a wildcard record already answers identically,
+    e.g. 'a.b' -> 1.2.3.4 when '*.b' (or '*') -> 1.2.3.4 also exists.
+    `records_per_name` counts records of every type per name.
+    Per RFC 4592 only the wildcard at the closest existing ancestor answers,
+    and names with descendants keep existing as empty non-terminals, so
+    such records are never reported.
+    """
+    wildcards = defaultdict(list)
+    for r in records:
+        if r.name.startswith('*'):
+            wildcards[r.name].append(r)
+    if not wildcards:
+        return []
+    
+    # Number of names with records below each name (empty non-terminals included)
+    descendants = defaultdict(int)
+    for name in records_per_name:
+        for parent in widened(name.partition('.')[-1]):
+            descendants[parent] += 1
+    
+    shadowed = []
+    for record in records:
+        # A wildcard only answers for names that have no records or descendants of their own
+        if (record.type not in DEDUP_TYPES or not record.name
+                or record.name.startswith('*') or records_per_name[record.name] > 1
+                or descendants.get(record.name)):
+            continue
+        
+        # The closest ancestor that still exists once this record is deleted (the apex
+        # at the latest) is the only possible source; the record itself is one descendant
+        encloser = next((parent for parent in widened(record.name.partition('.')[-1])
+                         if records_per_name.get(parent) or descendants[parent] > 1), '')
+        wildcard_name = f"*.{encloser}" if encloser else '*'
+        group = wildcards.get(wildcard_name)
+        
+        # The wildcard must answer exactly this record and nothing else
+        if (group and records_per_name[wildcard_name] == len(group)
+                and {(r.type, r.data) for r in group} == {(record.type, record.data)}):
+            shadowed.append((record, group[0]))
+    
+    return shadowed
+
+
+def resolve_shadowed(api_client, domain, shadowed):
+    """Offer to delete records that a wildcard already covers"""
+    print(f"Found {len(shadowed)} record(s) already covered by a wildcard:")
+    for record, wildcard in shadowed:
+        print(f"  - {record.type} {record.name} -> {record.data} (ID: {record.id}), "
+              f"covered by {wildcard.name}")
+    
+    confirm = input("\nDelete these records? (yes/no): ").strip().lower()
+    if confirm != 'yes':
+        print("Skipped.\n")
+        return
+    
+    for record, _ in shadowed:
+        try:
+            api_client.delete_dns_record(domain, record.id)
+            print(f"✓ Deleted record: {record.name} -> {record.data}")
+        except Exception as e:
+            print(f"✗ Failed to delete record {record.name}: {e}")
+    print()
+
+
+def resolve_duplicates(api_client, domain, records, label):
+    """Ask which of the duplicate records to keep and delete the rest"""
+    print(f"Found {len(records)} {label}:")
+    for i, record in enumerate(records):
+        print(f"{i+1}. ID: {record.id}")
+        print(f"   IP: {record.data}")
+        print(f"   TTL: {record.ttl}")
+        print()
+    
+    print("Multiple records detected!")
+    print("Which record would you like to keep?")
+    
+    while True:
+        try:
+            choice = input(f"Enter number (1-{len(records)}), 'skip' or 'cancel': ").strip()
+            if choice.lower() == 'cancel':
+                print("Operation cancelled.")
+                sys.exit(0)
+            if choice.lower() == 'skip':
+                print("Skipped.\n")
+                return
+            
+            choice_num = int(choice) - 1
+            if 0 <= choice_num < len(records):
+                break
+            else:
+                print(f"Please enter a number between 1 and {len(records)}")
+        except ValueError:
+            print("Please enter a valid number, 'skip' or 'cancel'")
+    
+    keep_record = records[choice_num]
+    delete_records = [r for r in records if r.id != keep_record.id]
+    
+    print(f"\nKeeping record: {keep_record.data} (ID: {keep_record.id})")
+    print("Deleting records:")
+    for record in delete_records:
+        print(f"  - {record.data} (ID: {record.id})")
+    
+    confirm = input("\nConfirm deletion? (yes/no): ").strip().lower()
+    if confirm != 'yes':
+        print("Skipped.\n")
+        return
+    
+    # Delete old records
+    for record in delete_records:
+        try:
+            api_client.delete_dns_record(domain, record.id)
+            print(f"✓ Deleted record: {record.data}")
+        except Exception as e:
+            print(f"✗ Failed to delete record {record.data}: {e}")
+    print()
+
+
 def main():
     # Load configuration
     config_manager = ConfigManager()
@@ -18,64 +149,30 @@ def main():
     print(f"Cleaning up DNS records for: {domain}")
     print("=" * 50)
     
-    # List all DNS records
-    records = api_client.list_dns_records(domain)
+    # Stream all DNS records, bucketing address records by (type, name) in a single pass
+    buckets = defaultdict(list)
+    records_per_name = defaultdict(int)
+    for record in api_client.iter_dns_records(domain):
+        records_per_name[record.name] += 1
+        if record.type in DEDUP_TYPES:
+            buckets[(record.type, record.name)].append(record)
     
-    # Find all A records with empty name (root domain)
-    a_records = [r for r in records if r.type == 'A' and r.name == '']
+    duplicates = [(key, bucket) for key, bucket in buckets.items() if len(bucket) > 1]
+    address_records = [record for bucket in buckets.values() for record in bucket]
+    shadowed = find_wildcard_shadowed(address_records, records_per_name)
     
-    if len(a_records) <= 1:
-        print("No duplicate A records found.")
+    if not duplicates and not shadowed:
+        print("No duplicate records found.")
         return
     
-    print(f"Found {len(a_records)} A records for root domain:")
-    for i, record in enumerate(a_records):
-        print(f"{i+1}. ID: {record.id}")
-        print(f"   IP: {record.data}")
-        print(f"   TTL: {record.ttl}")
-        print()
+    for (record_type, name), bucket in duplicates:
+        label = f"{record_type} records for {name or 'root domain'}"
+        resolve_duplicates(api_client, domain, bucket, label)
     
-    if len(a_records) > 1:
-        print("Multiple A records detected!")
-        print("Which record would you like to keep?")
-        
-        while True:
-            try:
-                choice = input(f"Enter number (1-{len(a_records)}) or 'cancel': ").strip()
-                if choice.lower() == 'cancel':
-                    print("Operation cancelled.")
-                    return
-                
-                choice_num = int(choice) - 1
-                if 0 <= choice_num < len(a_records):
-                    break
-                else:
-                    print(f"Please enter a number between 1 and {len(a_records)}")
-            except ValueError:
-                print("Please enter a valid number or 'cancel'")
-        
-        keep_record = a_records[choice_num]
-        delete_records = [r for r in a_records if r.id != keep_record.id]
-        
-        print(f"\nKeeping record: {keep_record.data} (ID: {keep_record.id})")
-        print("Deleting records:")
-        for record in delete_records:
-            print(f"  - {record.data} (ID: {record.id})")
-        
-        confirm = input("\nConfirm deletion? (yes/no): ").strip().lower()
-        if confirm != 'yes':
-            print("Operation cancelled.")
-            return
-        
-        # Delete old records
-        for record in delete_records:
-            try:
-                api_client.delete_dns_record(domain, record.id)
-                print(f"✓ Deleted record: {record.data}")
-            except Exception as e:
-                print(f"✗ Failed to delete record {record.data}: {e}")
-        
-        print("\nCleanup completed!")
+    if shadowed:
+        resolve_shadowed(api_client, domain, shadowed)
+    
+    print("Cleanup completed!")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
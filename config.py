@@ -3,30 +3,57 @@ Configuration management for VULTR Dynamic DNS Updater
 """
 import json
 import os
-from typing import List, Dict, Any
-from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+from dataclasses import dataclass, field
 import logging
 
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used otherwise
+    orjson = None
+
+try:
+    from watchdog.observers import Observer
+except ImportError:  # Optional; config changes are detected by polling otherwise
+    Observer = None
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+def _json_loads(raw: bytes) -> Any:
+    """Parse JSON bytes, preferring orjson when available"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _json_dumps(data: Any) -> bytes:
+    """Serialize to indented UTF-8 JSON bytes, preferring orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+@dataclass(slots=True)
 class DomainConfig:
     """Configuration for a single domain"""
     domain: str
     subdomain: str
     record_type: str = 'A'
     ttl: int = 300
+    _full_domain: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self._full_domain = f"{self.subdomain}.{self.domain}" if self.subdomain else self.domain
     
     @property
     def full_domain(self) -> str:
         """Get the full domain name"""
-        if self.subdomain:
-            return f"{self.subdomain}.{self.domain}"
-        return self.domain
+        return self._full_domain
 
 
-@dataclass
+@dataclass(slots=True)
 class Config:
     """Main configuration"""
     api_key: str
@@ -51,7 +78,15 @@ class Config:
         """Convert Config to dictionary"""
         return {
             'api_key': self.api_key,
-            'domains': [asdict(d) for d in self.domains],
+            'domains': [
+                {
+                    'domain': d.domain,
+                    'subdomain': d.subdomain,
+                    'record_type': d.record_type,
+                    'ttl': d.ttl
+                }
+                for d in self.domains
+            ],
             'check_interval': self.check_interval,
             'retry_interval': self.retry_interval,
             'max_retries': self.max_retries
@@ -64,6 +99,11 @@ class ConfigManager:
     def __init__(self, config_file: str = 'config.json'):
         self.config_file = config_file
         self.config: Config = None
+    
+    @property
+    def state_file(self) -> str:
+        """Path of the updater's state file, kept next to the configuration"""
+        return str(Path(self.config_file).with_suffix('.state.json'))
         
     def load(self) -> Config:
         """Load configuration from file"""
@@ -71,8 +111,8 @@ class ConfigManager:
             raise FileNotFoundError(f"Configuration file '{self.config_file}' not found")
         
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(self.config_file, 'rb') as f:
+                data = _json_loads(f.read())
             
             self.config = Config.from_dict(data)
             logger.info(f"Configuration loaded from {self.config_file}")
@@ -93,8 +133,8 @@ class ConfigManager:
         if not self.config:
             raise ValueError("No configuration to save")
         
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config.to_dict(), f, indent=2, ensure_ascii=False)
+        with open(self.config_file, 'wb') as f:
+            f.write(_json_dumps(self.config.to_dict()))
         
         logger.info(f"Configuration saved to {self.config_file}")
     
@@ -122,9 +162,81 @@ class ConfigManager:
         }
         
         sample_file = 'config.sample.json'
-        with open(sample_file, 'w', encoding='utf-8') as f:
-            json.dump(sample_config, f, indent=2, ensure_ascii=False)
+        with open(sample_file, 'wb') as f:
+            f.write(_json_dumps(sample_config))
         
         logger.info(f"Sample configuration created: {sample_file}")
         print(f"Sample configuration file created: {sample_file}")
-        print(f"Please copy it to {self.config_file} and update with your settings.")
\ No newline at end of file
+        print(f"Please copy it to {self.config_file} and update with your settings.")
+
+
+class ConfigWatcher:
+    """
+    Watch the configuration file for changes
+    With watchdog installed, `on_change` is called as soon as the file system
+    reports an event for the file; otherwise the caller polls `has_changed()`
+    every POLL_INTERVAL seconds. Either way `has_changed()` decides whether the
+    file really changed.
+    """
+    
+    POLL_INTERVAL = 10  # seconds
+    
+    def __init__(self, config_file: str, on_change: Callable[[], None]):
+        self.path = Path(config_file).absolute()
+        self._path_str = os.fspath(self.path)
+        self.on_change = on_change
+        self._mtime = self._stat_mtime()
+        self._observer = None
+    
+    @property
+    def notifies(self) -> bool:
+        """Whether changes are pushed by file system notifications"""
+        return self._observer is not None
+    
+    def start(self) -> None:
+        """Start file system notifications when watchdog is available"""
+        if Observer is None:
+            logger.debug("watchdog not installed, polling configuration file for changes")
+            return
+        
+        try:
+            observer = Observer()
+            observer.schedule(_ConfigEventHandler(self), str(self.path.parent))
+            observer.daemon = True
+            observer.start()
+            self._observer = observer
+        except Exception as e:
+            logger.warning(f"Could not watch configuration file, falling back to polling: {e}")
+    
+    def stop(self) -> None:
+        """Stop file system notifications"""
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+    
+    def has_changed(self) -> bool:
+        """Check whether the file changed since the last time this returned True"""
+        mtime = self._stat_mtime()
+        if mtime != self._mtime:
+            self._mtime = mtime
+            return True
+        return False
+    
+    def _stat_mtime(self) -> int:
+        # One stat call; integer nanoseconds compare exactly
+        try:
+            return os.stat(self._path_str).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+
+class _ConfigEventHandler:
+    """watchdog event handler forwarding events that touch the config file"""
+    
+    def __init__(self, watcher: ConfigWatcher):
+        self.watcher = watcher
+    
+    def dispatch(self, event) -> None:
+        paths = (event.src_path, getattr(event, 'dest_path', None))
+        if any(p and Path(os.fsdecode(p)).absolute() == self.watcher.path for p in paths):
+            self.watcher.on_change()
@@ -2,9 +2,42 @@
 """
 Debug script to list all DNS records
 """
+import socket
+from functools import lru_cache
+from typing import List
+
 from config import ConfigManager
 from vultr_api import VultrAPIClient
 
+
+@lru_cache(maxsize=1)
+def get_local_ips() -> List[str]:
+    """Get all local IP addresses (cached; call get_local_ips.cache_clear() to refresh)"""
+    local_ips = []
+    
+    try:
+        # Get all IPv4 addresses for hostname
+        hostname = socket.gethostname()
+        for info in socket.getaddrinfo(hostname, None, family=socket.AF_INET):
+            ip = info[4][0]
+            if ip not in local_ips:
+                local_ips.append(ip)
+    except OSError as e:
+        print(f"Error resolving local hostname: {e}")
+    
+    # Also find the address used for outbound traffic (no packets are sent)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            local_ip = s.getsockname()[0]
+            if local_ip not in local_ips:
+                local_ips.append(local_ip)
+    except OSError:
+        pass
+    
+    return local_ips
+
+
 def main():
     # Load configuration
     config_manager = ConfigManager()
@@ -15,10 +48,11 @@ def main():
     
     print(f"Domain: {config.domains[0].domain}")
     print(f"Subdomain: '{config.domains[0].subdomain}'")
+    print(f"Local IPs: {', '.join(get_local_ips()) or 'N/A'}")
     print("=" * 50)
     
     # List all DNS records
-    records = api_client.list_dns_records(config.domains[0].domain)
+    records = api_client.iter_dns_records(config.domains[0].domain)
     
     print("All DNS records:")
     for i, record in enumerate(records):
@@ -2,31 +2,45 @@
 DNS Update service with multi-domain support
 """
 import logging
+import os
 import time
-from typing import List, Dict, Any
-from datetime import datetime
-from config import Config, DomainConfig
-from vultr_api import VultrAPIClient, VultrAPIError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, List, Dict, Any, Optional
+from datetime import datetime, timezone
+from config import Config, DomainConfig, _json_loads, _json_dumps
+from vultr_api import VultrAPIClient, VultrAPIError, DNSRecord, NOT_FETCHED
 from ip_monitor import IPMonitor
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent record listings
+MAX_UPDATE_WORKERS = 8
+# Factor the check interval grows by after each check with an unchanged IP
+INTERVAL_BACKOFF = 1.5
+# Seconds the records are trusted to match the public IP before re-reading them
+REVALIDATE_INTERVAL = 3600
+# Number of update results kept in DNSUpdater.update_history
+MAX_UPDATE_HISTORY = 1000
 
+
+@dataclass(slots=True)
 class DNSUpdateResult:
     """Result of DNS update operation"""
-    
-    def __init__(self, domain: str, subdomain: str, success: bool, 
-                 old_ip: str = None, new_ip: str = None, error: str = None):
-        self.domain = domain
-        self.subdomain = subdomain
-        self.success = success
-        self.old_ip = old_ip
-        self.new_ip = new_ip
-        self.error = error
-        self.timestamp = datetime.now()
+    domain: str
+    subdomain: str
+    success: bool
+    old_ip: str = None
+    new_ip: str = None
+    error: str = None
+    changed: bool = True
+    timestamp: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
     
     def __str__(self) -> str:
-        if self.success:
+        if self.success and not self.changed:
+            return f"✓ {self.get_full_domain()}: {self.new_ip} (unchanged)"
+        elif self.success:
             return f"✓ {self.get_full_domain()}: {self.old_ip} -> {self.new_ip}"
         else:
             return f"✗ {self.get_full_domain()}: {self.error}"
@@ -41,56 +55,195 @@ class DNSUpdateResult:
 class DNSUpdater:
     """DNS Updater service"""
     
-    def __init__(self, config: Config, api_client: VultrAPIClient, ip_monitor: IPMonitor):
+    def __init__(self, config: Config, api_client: VultrAPIClient, ip_monitor: IPMonitor,
+                 state_file: Optional[str] = None):
         self.config = config
         self.api_client = api_client
         self.ip_monitor = ip_monitor
-        self.update_history: List[DNSUpdateResult] = []
+        # Last IP all records were confirmed to point at, kept across restarts
+        self.state_file = state_file
+        # Recent writes and failures; records already pointing at the IP are not kept
+        self.update_history: Deque[DNSUpdateResult] = deque(maxlen=MAX_UPDATE_HISTORY)
         
+    @property
+    def config(self) -> Config:
+        """Active configuration; assigning a new one refreshes derived state"""
+        return self._config
+    
+    @config.setter
+    def config(self, config: Config) -> None:
+        previous = getattr(self, '_config', None)
+        self._config = config
+        # Derive everything the polling loop needs from the domain list once per config
+        self._full_domains = tuple(d.full_domain for d in config.domains)
+        self._apex_domains = tuple(dict.fromkeys(d.domain for d in config.domains))
+        self._max_ttl = max((d.ttl for d in config.domains), default=0)
+        # Address family of the public IP to track: IPv6 only for AAAA-only configs
+        record_types = {d.record_type.upper() for d in config.domains}
+        self.ip_version = 6 if record_types == {'AAAA'} else 4
+        if 'AAAA' in record_types and self.ip_version == 4:
+            logger.warning("A and AAAA records are configured together; only the IPv4 address is tracked")
+        # Backed-off check interval in seconds, None while at the configured interval
+        self._interval: Optional[float] = None
+        # Monotonic time the records were last confirmed, None to re-read them on the next check
+        if previous is None or previous.domains != config.domains:
+            self._validated_at: Optional[float] = None
+    
     def update_all_domains(self, ip_address: str) -> List[DNSUpdateResult]:
-        """Update all configured domains with new IP"""
-        results = []
+        """
+        Update all configured domains with new IP
+        Records already pointing at the IP are skipped; the rest are written in
+        one concurrent burst through the API client.
+        """
+        domains = self.config.domains
+        logger.info(f"Updating {len(domains)} domain(s) to IP {ip_address}")
+        
+        if not domains:
+            return []
         
-        logger.info(f"Updating {len(self.config.domains)} domain(s) to IP {ip_address}")
+        # Warm the client's record cache so subdomains of one apex share a single listing
+        with ThreadPoolExecutor(max_workers=min(MAX_UPDATE_WORKERS, len(self._apex_domains))) as executor:
+            list(executor.map(self._prefetch_records, self._apex_domains))
         
-        for domain_config in self.config.domains:
-            result = self._update_single_domain(domain_config, ip_address)
-            results.append(result)
-            self.update_history.append(result)
+        results: List[Optional[DNSUpdateResult]] = [None] * len(domains)
+        pending = []  # (index, existing_record) of domains that need a write
+        
+        for index, domain_config in enumerate(domains):
+            existing_record = self._lookup_record(domain_config)
+            old_ip = existing_record.data if isinstance(existing_record, DNSRecord) else None
             
+            # Nothing to write if the record already points at this IP
+            if old_ip == ip_address:
+                results[index] = DNSUpdateResult(
+                    domain=domain_config.domain,
+                    subdomain=domain_config.subdomain,
+                    success=True,
+                    old_ip=old_ip,
+                    new_ip=ip_address,
+                    changed=False
+                )
+            else:
+                pending.append((index, existing_record))
+        
+        # Records were looked up above, so the client does not list the zones again
+        writes = []
+        for index, existing_record in pending:
+            d = domains[index]
+            writes.append((d.domain, d.subdomain, ip_address, d.record_type, d.ttl, existing_record))
+        errors = self.api_client.bulk_update_or_create(writes)
+        
+        for (index, existing_record), error in zip(pending, errors):
+            old_ip = existing_record.data if isinstance(existing_record, DNSRecord) else None
+            results[index] = self._make_result(domains[index], ip_address, old_ip, error)
+        
+        for result in results:
             # Log result
             if result.success:
                 logger.info(str(result))
             else:
                 logger.error(str(result))
-            
-            # Small delay between updates to avoid rate limiting
-            if len(self.config.domains) > 1:
-                time.sleep(1)
         
+        self.update_history.extend(r for r in results if r.changed or not r.success)
+        if all(result.success for result in results):
+            self._mark_validated(ip_address)
+        else:
+            # Retry the failed records on the next check
+            self._validated_at = None
         return results
     
-    def _update_single_domain(self, domain_config: DomainConfig, ip_address: str) -> DNSUpdateResult:
-        """Update a single domain"""
+    def _prefetch_records(self, domain: str) -> None:
+        """Populate the client's record cache, leaving failures to the per-domain update"""
         try:
-            # Get current record if exists
-            existing_record = self.api_client.find_dns_record(
-                domain_config.domain,
-                domain_config.subdomain,
-                domain_config.record_type
-            )
-            
-            old_ip = existing_record.data if existing_record else None
-            
-            # Update or create record
-            self.api_client.update_or_create_dns_record(
-                domain=domain_config.domain,
-                subdomain=domain_config.subdomain,
-                ip_address=ip_address,
-                record_type=domain_config.record_type,
-                ttl=domain_config.ttl
-            )
-            
+            self.api_client.list_dns_records(domain)
+        except VultrAPIError as e:
+            logger.warning(f"Could not list DNS records for {domain}: {e}")
+    
+    def _find_record(self, domain_config: DomainConfig) -> Optional[DNSRecord]:
+        """Find the DNS record for a domain"""
+        return self.api_client.find_dns_record(
+            domain_config.domain,
+            domain_config.subdomain,
+            domain_config.record_type
+        )
+    
+    def _lookup_record(self, domain_config: DomainConfig) -> Optional[DNSRecord]:
+        """Find the DNS record for a domain, or NOT_FETCHED if the lookup failed"""
+        try:
+            return self._find_record(domain_config)
+        except VultrAPIError:
+            return NOT_FETCHED
+    
+    def _seed_current_ip(self) -> None:
+        """
+        Seed the monitor's current IP from existing DNS records on first run,
+        so a restart does not force an update when the records are already correct
+        """
+        try:
+            records = [self._find_record(d) for d in self.config.domains]
+        except VultrAPIError as e:
+            logger.warning(f"Could not read existing DNS records: {e}")
+            return
+        
+        record_ips = {r.data for r in records if r}
+        if records and all(records) and len(record_ips) == 1:
+            self.ip_monitor.current_ip = record_ips.pop()
+            self._mark_validated(self.ip_monitor.current_ip)
+            logger.info(f"DNS records currently point to {self.ip_monitor.current_ip}")
+    
+    def _state_key(self) -> List[str]:
+        """Identify the configured records, so state saved for another config is ignored"""
+        return sorted(f"{d.record_type} {d.full_domain}" for d in self.config.domains)
+    
+    def _load_state(self) -> bool:
+        """
+        Seed the monitor's current IP from the state file
+        Returns False when there is no usable state for the configured records.
+        """
+        if not self.state_file:
+            return False
+        
+        try:
+            with open(self.state_file, 'rb') as f:
+                state = _json_loads(f.read())
+            if state['records'] != self._state_key():
+                return False
+            ip_address, validated_at = state['ip'], float(state['validated_at'])
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable state file {self.state_file}: {e}")
+            return False
+        
+        self.ip_monitor.current_ip = ip_address
+        # Carry the age of the saved confirmation over to the monotonic clock
+        self._validated_at = time.monotonic() - max(0.0, time.time() - validated_at)
+        logger.info(f"DNS records last confirmed to point to {ip_address}")
+        return True
+    
+    def _mark_validated(self, ip_address: str) -> None:
+        """Record that every configured record points at `ip_address`"""
+        self._validated_at = time.monotonic()
+        if not self.state_file:
+            return
+        
+        state = {'ip': ip_address, 'records': self._state_key(), 'validated_at': time.time()}
+        tmp_file = f"{self.state_file}.tmp"
+        try:
+            # Write then rename, so a crash never leaves a truncated state file
+            with open(tmp_file, 'wb') as f:
+                f.write(_json_dumps(state))
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            logger.warning(f"Could not write state file {self.state_file}: {e}")
+    
+    def _validation_due(self) -> bool:
+        """Whether the records should be re-read to catch changes made outside this updater"""
+        return self._validated_at is None or time.monotonic() - self._validated_at >= REVALIDATE_INTERVAL
+    
+    def _make_result(self, domain_config: DomainConfig, ip_address: str,
+                     old_ip: Optional[str], error: Optional[Exception]) -> DNSUpdateResult:
+        """Build the result of writing a single domain"""
+        if error is None:
             return DNSUpdateResult(
                 domain=domain_config.domain,
                 subdomain=domain_config.subdomain,
@@ -98,56 +251,93 @@ class DNSUpdater:
                 old_ip=old_ip,
                 new_ip=ip_address
             )
-            
-        except VultrAPIError as e:
-            return DNSUpdateResult(
-                domain=domain_config.domain,
-                subdomain=domain_config.subdomain,
-                success=False,
-                error=str(e)
-            )
-        except Exception as e:
-            logger.exception(f"Unexpected error updating {domain_config.full_domain}")
-            return DNSUpdateResult(
-                domain=domain_config.domain,
-                subdomain=domain_config.subdomain,
-                success=False,
-                error=f"Unexpected error: {e}"
-            )
+        
+        if isinstance(error, VultrAPIError):
+            message = str(error)
+        else:
+            logger.error(f"Unexpected error updating {domain_config.full_domain}", exc_info=error)
+            message = f"Unexpected error: {error}"
+        
+        return DNSUpdateResult(
+            domain=domain_config.domain,
+            subdomain=domain_config.subdomain,
+            success=False,
+            error=message
+        )
     
     def check_and_update(self) -> bool:
         """Check for IP change and update if needed"""
         try:
-            has_changed, new_ip = self.ip_monitor.check_ip_change()
+            public_ip = None
+            if self.ip_monitor.current_ip is None and not self._load_state():
+                # First run: list the existing records while the public IP is looked up
+                with ThreadPoolExecutor(max_workers=1 + len(self._apex_domains)) as executor:
+                    ip_future = executor.submit(self.ip_monitor.get_public_ip, self.ip_version)
+                    list(executor.map(self._prefetch_records, self._apex_domains))
+                    public_ip = ip_future.result()
+                
+                self._seed_current_ip()
+            
+            has_changed, new_ip = self.ip_monitor.check_ip_change(public_ip, self.ip_version)
+            
+            # Back off while the IP is stable, check at the configured rate otherwise
+            if has_changed or not new_ip:
+                self._interval = None
+            else:
+                base = self.config.check_interval
+                self._interval = min((self._interval or base) * INTERVAL_BACKOFF, self._max_interval())
             
             if has_changed and new_ip:
                 logger.info(f"IP change detected, updating DNS records to {new_ip}")
-                results = self.update_all_domains(new_ip)
-                
-                # Check if all updates succeeded
-                success_count = sum(1 for r in results if r.success)
-                total_count = len(results)
-                
-                if success_count == total_count:
+            elif new_ip and self._validation_due():
+                logger.info(f"Re-validating DNS records against {new_ip}")
+            else:
+                return True
+            
+            results = self.update_all_domains(new_ip)
+            
+            # Check if all updates succeeded
+            success_count = sum(1 for r in results if r.success)
+            total_count = len(results)
+            
+            if success_count == total_count:
+                if any(r.changed for r in results):
                     logger.info(f"Successfully updated all {total_count} domain(s)")
-                    self.ip_monitor.last_update = datetime.now()
-                    return True
-                elif success_count > 0:
-                    logger.warning(f"Partially updated {success_count}/{total_count} domain(s)")
-                    return False
+                    self.ip_monitor.last_update = datetime.now(timezone.utc)
                 else:
-                    logger.error(f"Failed to update any domains (0/{total_count})")
-                    return False
-            
-            return True
+                    logger.info(f"Confirmed all {total_count} domain(s) point to {new_ip}")
+                return True
+            elif success_count > 0:
+                logger.warning(f"Partially updated {success_count}/{total_count} domain(s)")
+                return False
+            else:
+                logger.error(f"Failed to update any domains (0/{total_count})")
+                return False
             
         except Exception as e:
             logger.exception(f"Error during check and update: {e}")
             return False
     
+    def next_interval(self) -> int:
+        """
+        Seconds to wait before the next check
+        Starts at the configured check interval and grows after each unchanged
+        check, capped at twice the largest record TTL (more frequent checks
+        cannot propagate faster than resolvers re-query).
+        """
+        base = self.config.check_interval
+        if self._interval is None:
+            return base
+        
+        return int(max(base, min(self._interval, self._max_interval())))
+    
+    def _max_interval(self) -> int:
+        """Upper bound of the backed-off interval"""
+        return max(self.config.check_interval, 2 * self._max_ttl)
+    
     def force_update(self) -> List[DNSUpdateResult]:
         """Force update all domains with current IP"""
-        current_ip = self.ip_monitor.get_public_ip()
+        current_ip = self.ip_monitor.get_public_ip(self.ip_version)
         
         if not current_ip:
             logger.error("Cannot force update: unable to determine current IP")
@@ -162,7 +352,8 @@ class DNSUpdater:
             'current_ip': self.ip_monitor.current_ip,
             'last_check': self.ip_monitor.last_check.isoformat() if self.ip_monitor.last_check else None,
             'last_update': self.ip_monitor.last_update.isoformat() if self.ip_monitor.last_update else None,
-            'domains': [d.full_domain for d in self.config.domains],
+            'seconds_since_check': self.ip_monitor.seconds_since_check(),
+            'domains': self._full_domains,
             'update_count': len(self.update_history)
         }
     
@@ -170,13 +361,10 @@ class DNSUpdater:
         """Verify current DNS records for all configured domains"""
         verification_results = []
         
+        # Record lists are cached, so each apex domain is only listed once
         for domain_config in self.config.domains:
             try:
-                record = self.api_client.find_dns_record(
-                    domain_config.domain,
-                    domain_config.subdomain,
-                    domain_config.record_type
-                )
+                record = self._find_record(domain_config)
                 
                 if record:
                     verification_results.append({
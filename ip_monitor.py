@@ -2,10 +2,14 @@
 IP Address monitoring service
 """
 import requests
-import socket
+from requests.adapters import HTTPAdapter
 import logging
-from typing import Optional, List
-from datetime import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Tuple
+from datetime import datetime, timezone
+from ipaddress import ip_address
 
 logger = logging.getLogger(__name__)
 
@@ -14,73 +18,144 @@ class IPMonitor:
     """Monitor and detect IP address changes"""
     
     # Public IP detection services
-    IP_SERVICES = [
+    IP_SERVICES: Tuple[str, ...] = (
         'https://api.ipify.org',
         'https://ipapi.co/ip',
         'https://checkip.amazonaws.com',
         'https://ifconfig.me/ip',
         'https://icanhazip.com',
         'https://ident.me'
-    ]
+    )
+    
+    # Services failing this many times in a row are only tried as a fallback
+    MAX_CONSECUTIVE_FAILURES = 3
+    # Latency penalty (ms) recorded for a failed probe
+    FAILURE_LATENCY_MS = 5000.0
     
     def __init__(self):
         self.current_ip: Optional[str] = None
         self.last_check: Optional[datetime] = None
         self.last_update: Optional[datetime] = None
+        # Monotonic clock reading of the last check, for measuring intervals
+        self._last_check_monotonic: Optional[float] = None
+        # Per-service (EWMA latency in ms, consecutive failures)
+        self._service_stats: Dict[str, Tuple[float, int]] = {}
+        self._stats_lock = threading.Lock()
+        
+        # Reuse connections to the IP services across polls (keep-alive)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=len(self.IP_SERVICES),
+            pool_maxsize=len(self.IP_SERVICES)
+        )
+        self.session.mount('https://', adapter)
+        
+    def get_public_ip(self, ip_version: int = 4) -> Optional[str]:
+        """
+        Get current public IP address of the given version (4 or 6)
+        Services are queried concurrently, fastest first, and the first valid
+        answer of that version wins. Some services are dual-stack, so answers of
+        the other version are ignored. Repeatedly failing services are only
+        tried if all others fail.
+        """
+        healthy, demoted = self._ordered_services()
+        
+        ip = self._race_services(healthy, ip_version)
+        if ip is None and demoted:
+            logger.debug(f"Falling back to demoted IP services: {demoted}")
+            ip = self._race_services(demoted, ip_version)
         
-    def get_public_ip(self) -> Optional[str]:
-        """Get current public IP address"""
-        for service in self.IP_SERVICES:
-            try:
-                logger.debug(f"Checking IP using {service}")
-                response = requests.get(service, timeout=5)
-                response.raise_for_status()
-                
-                ip = response.text.strip()
-                
-                # Validate IP format
-                if self._validate_ip(ip):
-                    logger.debug(f"Got IP {ip} from {service}")
-                    return ip
-                else:
-                    logger.warning(f"Invalid IP format from {service}: {ip}")
+        if ip is None:
+            logger.error("Failed to get public IP from all services")
+        return ip
+    
+    def _ordered_services(self) -> Tuple[List[str], List[str]]:
+        """Split services into (healthy, demoted), each sorted by observed latency"""
+        with self._stats_lock:
+            stats = dict(self._service_stats)
+        
+        ordered = sorted(self.IP_SERVICES, key=lambda s: stats.get(s, (0.0, 0)))
+        healthy = [s for s in ordered if stats.get(s, (0.0, 0))[1] < self.MAX_CONSECUTIVE_FAILURES]
+        demoted = [s for s in ordered if s not in healthy]
+        return healthy, demoted
+    
+    def _race_services(self, services: List[str], ip_version: int) -> Optional[str]:
+        """Query services concurrently and return the first valid IP of `ip_version`"""
+        futures = {_probe_executor.submit(self._fetch_ip, service): service
+                   for service in services}
+        try:
+            for future in as_completed(futures):
+                service = futures[future]
+                try:
+                    ip = future.result()
                     
-            except requests.RequestException as e:
-                logger.warning(f"Failed to get IP from {service}: {e}")
-                continue
-            except Exception as e:
-                logger.error(f"Unexpected error getting IP from {service}: {e}")
-                continue
+                    # Validate IP format
+                    if not self._validate_ip(ip):
+                        logger.warning(f"Invalid IP format from {service}: {ip}")
+                        self._record_failure(service)
+                    elif ip_address(ip).version != ip_version:
+                        logger.debug(f"Ignoring IPv{ip_address(ip).version} address {ip} from {service}")
+                    else:
+                        logger.debug(f"Got IP {ip} from {service}")
+                        return ip
+                        
+                except requests.RequestException as e:
+                    logger.warning(f"Failed to get IP from {service}: {e}")
+                except Exception as e:
+                    logger.error(f"Unexpected error getting IP from {service}: {e}")
+        finally:
+            # Drop probes that have not started yet; in-flight ones finish on their own
+            for future in futures:
+                future.cancel()
         
-        logger.error("Failed to get public IP from all services")
         return None
     
+    def _fetch_ip(self, service: str) -> str:
+        """Fetch the raw IP string from a single service"""
+        logger.debug(f"Checking IP using {service}")
+        started = time.perf_counter()
+        try:
+            response = self.session.get(service, timeout=5)
+            response.raise_for_status()
+        except requests.RequestException:
+            self._record_failure(service)
+            raise
+        
+        self._record_success(service, (time.perf_counter() - started) * 1000)
+        # These services answer in plain ASCII; skip requests' charset detection
+        return response.content.decode('ascii', 'ignore').strip(' \r\n\t')
+    
+    def _record_success(self, service: str, elapsed_ms: float) -> None:
+        """Fold a successful probe's latency into the service's EWMA"""
+        with self._stats_lock:
+            ewma, _ = self._service_stats.get(service, (elapsed_ms, 0))
+            self._service_stats[service] = (0.8 * ewma + 0.2 * elapsed_ms, 0)
+    
+    def _record_failure(self, service: str) -> None:
+        """Penalize a failed probe and bump its consecutive failure count"""
+        with self._stats_lock:
+            _, failures = self._service_stats.get(service, (0.0, 0))
+            self._service_stats[service] = (self.FAILURE_LATENCY_MS, failures + 1)
+    
     def _validate_ip(self, ip: str) -> bool:
-        """Validate IP address format"""
+        """Validate IP address format (IPv4 or IPv6)"""
         try:
-            # Try to parse as IPv4
-            parts = ip.split('.')
-            if len(parts) == 4:
-                for part in parts:
-                    num = int(part)
-                    if num < 0 or num > 255:
-                        return False
-                return True
-            
-            # Try to parse as IPv6
-            socket.inet_pton(socket.AF_INET6, ip)
+            ip_address(ip)
             return True
-            
-        except (ValueError, socket.error):
+        except ValueError:
             return False
     
-    def check_ip_change(self) -> tuple[bool, Optional[str]]:
+    def check_ip_change(self, new_ip: Optional[str] = None,
+                        ip_version: int = 4) -> tuple[bool, Optional[str]]:
         """
         Check if IP has changed
+        Pass `new_ip` when the public IP has already been looked up.
         Returns: (has_changed, new_ip)
         """
-        self.last_check = datetime.now()
-        new_ip = self.get_public_ip()
+        self.last_check = datetime.now(timezone.utc)
+        self._last_check_monotonic = time.monotonic()
+        if new_ip is None:
+            new_ip = self.get_public_ip(ip_version)
         
         if new_ip is None:
             logger.error("Could not determine current IP address")
@@ -101,38 +176,23 @@ class IPMonitor:
         logger.info(f"IP address unchanged: {new_ip}")
         return False, new_ip
     
-    def get_local_ips(self) -> List[str]:
-        """Get all local IP addresses (for debugging)"""
-        local_ips = []
-        
-        try:
-            # Get hostname
-            hostname = socket.gethostname()
-            
-            # Get all IPs for hostname
-            ips = socket.gethostbyname_ex(hostname)[2]
-            local_ips.extend(ips)
-            
-            # Also try to get IP by connecting to external server
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            try:
-                s.connect(("8.8.8.8", 80))
-                local_ip = s.getsockname()[0]
-                if local_ip not in local_ips:
-                    local_ips.append(local_ip)
-            except:
-                pass
-            finally:
-                s.close()
-                
-        except Exception as e:
-            logger.warning(f"Error getting local IPs: {e}")
-        
-        return local_ips
+    def seconds_since_check(self) -> Optional[float]:
+        """Seconds elapsed since the last check, unaffected by wall-clock changes"""
+        if self._last_check_monotonic is None:
+            return None
+        return time.monotonic() - self._last_check_monotonic
     
     def reset(self) -> None:
         """Reset the monitor state"""
         self.current_ip = None
         self.last_check = None
+        self._last_check_monotonic = None
         self.last_update = None
-        logger.info("IP monitor state reset")
\ No newline at end of file
+        logger.info("IP monitor state reset")
+
+
+# Shared worker pool for IP probes, reused across checks to avoid thread startup per poll
+_probe_executor = ThreadPoolExecutor(
+    max_workers=len(IPMonitor.IP_SERVICES),
+    thread_name_prefix='ip-probe'
+)
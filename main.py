@@ -3,30 +3,109 @@
 VULTR Dynamic DNS Updater
 Main application entry point
 """
+import atexit
+import hmac
+import queue
+import select
 import sys
 import time
 import signal
 import logging
 import argparse
 import os
-from datetime import datetime
+import threading
+from dataclasses import dataclass, field
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
 
-from config import ConfigManager
+from config import Config, ConfigManager, ConfigWatcher
 from vultr_api import VultrAPIClient, VultrAPIError
 from ip_monitor import IPMonitor
 from dns_updater import DNSUpdater
 
-# Global flag for graceful shutdown
-shutdown_requested = False
+logger = logging.getLogger(__name__)
 
 
-def signal_handler(signum, frame):
+@dataclass(slots=True)
+class Runtime:
+    """State shared between the daemon loop and the signal handlers"""
+    # Set once a shutdown has been requested
+    shutdown: threading.Event = field(default_factory=threading.Event)
+    # Set to wake the main loop early on Windows, which has no wakeup pipe
+    wakeup: threading.Event = field(default_factory=threading.Event)
+    logger: logging.Logger = logger
+    config: Optional[Config] = None
+    api: Optional[VultrAPIClient] = None
+    ip_monitor: Optional[IPMonitor] = None
+    updater: Optional[DNSUpdater] = None
+    # (read fd, write fd) of the pipe signals and wake() write to on POSIX
+    _wakeup_pipe: Optional[Tuple[int, int]] = field(default=None, init=False, repr=False)
+    
+    def __post_init__(self):
+        if os.name != 'nt':
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(read_fd, False)
+            os.set_blocking(write_fd, False)
+            self._wakeup_pipe = (read_fd, write_fd)
+    
+    def install_signal_handlers(self) -> None:
+        """Handle SIGINT/SIGTERM; must be called from the main thread"""
+        handler = partial(signal_handler, self)
+        signal.signal(signal.SIGINT, handler)
+        signal.signal(signal.SIGTERM, handler)
+        if self._wakeup_pipe is not None:
+            # Signals wake a pending select() immediately
+            signal.set_wakeup_fd(self._wakeup_pipe[1])
+    
+    def wake(self) -> None:
+        """Wake the main loop early (shutdown or configuration change)"""
+        if self._wakeup_pipe is None:
+            self.wakeup.set()
+            return
+        
+        try:
+            os.write(self._wakeup_pipe[1], b'\0')
+        except BlockingIOError:
+            pass  # Pipe full, a wakeup is already pending
+    
+    def wait_for_wakeup(self, timeout: float) -> bool:
+        """
+        Sleep up to `timeout` seconds, returning early when the main loop is woken
+        Returns whether it was woken.
+        """
+        if self._wakeup_pipe is None:
+            # Lock waits are not interruptible by Ctrl+C on Windows; keep them short
+            woken = self.wakeup.wait(min(timeout, 1.0))
+            self.wakeup.clear()
+            return woken
+        
+        read_fd = self._wakeup_pipe[0]
+        ready, _, _ = select.select([read_fd], [], [], timeout)
+        if ready:
+            try:
+                while os.read(read_fd, 512):
+                    pass
+            except BlockingIOError:
+                pass  # Drained
+        return bool(ready)
+    
+    def wait_for_shutdown(self, timeout: float) -> None:
+        """Sleep up to `timeout` seconds, returning early on shutdown"""
+        deadline = time.monotonic() + timeout
+        while not self.shutdown.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self.wait_for_wakeup(remaining)
+
+
+def signal_handler(runtime: Runtime, signum, frame):
     """Handle shutdown signals"""
-    global shutdown_requested
-    logger.info(f"Received signal {signum}, initiating graceful shutdown...")
-    shutdown_requested = True
+    runtime.logger.info("Received signal %s, initiating graceful shutdown...", signum)
+    runtime.shutdown.set()
+    runtime.wake()
 
 
 def setup_logging(log_level: str = 'INFO', log_file: Optional[str] = None):
@@ -41,7 +120,6 @@ def setup_logging(log_level: str = 'INFO', log_file: Optional[str] = None):
         log_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Add file handler with rotation
-        from logging.handlers import RotatingFileHandler
         file_handler = RotatingFileHandler(
             log_file,
             maxBytes=10*1024*1024,  # 10MB
@@ -49,10 +127,21 @@ def setup_logging(log_level: str = 'INFO', log_file: Optional[str] = None):
         )
         handlers.append(file_handler)
     
+    # Console and file I/O happen on the listener's thread, off the monitoring loop
+    formatter = logging.Formatter(log_format)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    # The queue handler only merges args and tracebacks into the message
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
     logging.basicConfig(
         level=getattr(logging, log_level.upper()),
-        format=log_format,
-        handlers=handlers
+        handlers=[queue_handler]
     )
     
     # Set third-party loggers to WARNING
@@ -60,185 +149,215 @@ def setup_logging(log_level: str = 'INFO', log_file: Optional[str] = None):
     logging.getLogger('requests').setLevel(logging.WARNING)
 
 
-def run_daemon(config_manager: ConfigManager):
+def build_runtime(config_manager: ConfigManager, runtime: Optional[Runtime] = None) -> Runtime:
+    """
+    Load the configuration and create the API client, IP monitor and updater
+    The components are attached to `runtime` (a new one if not given), so one
+    HTTP session is reused for everything a command does.
+    """
+    runtime = runtime or Runtime()
+    config = config_manager.load()
+    api_client = VultrAPIClient(config.api_key)
+    ip_monitor = IPMonitor()
+    runtime.config, runtime.api = config, api_client
+    runtime.ip_monitor = ip_monitor
+    runtime.updater = DNSUpdater(config, api_client, ip_monitor, config_manager.state_file)
+    return runtime
+
+
+def run_daemon(config_manager: ConfigManager, runtime: Runtime):
     """Run the DNS updater as a daemon"""
-    global shutdown_requested
-    
-    logger.info("Starting VULTR Dynamic DNS Updater daemon")
+    log = runtime.logger
+    shutdown = runtime.shutdown
+    log.info("Starting VULTR Dynamic DNS Updater daemon")
     
-    # Load configuration
+    # Load configuration and initialize components
     try:
-        config = config_manager.load()
+        build_runtime(config_manager, runtime)
     except FileNotFoundError:
-        logger.error(f"Configuration file not found. Creating sample configuration...")
+        log.error(f"Configuration file not found. Creating sample configuration...")
         config_manager.create_sample_config()
         sys.exit(1)
     except Exception as e:
-        logger.error(f"Failed to load configuration: {e}")
+        log.error(f"Failed to load configuration: {e}")
         sys.exit(1)
+    config, api_client, dns_updater = runtime.config, runtime.api, runtime.updater
     
-    # Get config file modification time
-    config_path = Path(config_manager.config_file)
-    config_mtime = config_path.stat().st_mtime if config_path.exists() else 0
-    
-    # Initialize components
-    api_client = VultrAPIClient(config.api_key)
-    ip_monitor = IPMonitor()
-    dns_updater = DNSUpdater(config, api_client, ip_monitor)
+    # Watch the config file; change notifications wake the main loop
+    config_watcher = ConfigWatcher(config_manager.config_file, runtime.wake)
     
     # Test API connection
-    logger.info("Testing VULTR API connection...")
+    log.info("Testing VULTR API connection...")
     if not api_client.test_connection():
-        logger.error("Failed to connect to VULTR API. Please check your API key.")
+        log.error("Failed to connect to VULTR API. Please check your API key.")
         sys.exit(1)
     
-    logger.info("API connection successful")
-    logger.info("Configuration file monitoring enabled - changes will be auto-reloaded")
+    log.info("API connection successful")
+    config_watcher.start()
+    log.info("Configuration file monitoring enabled - changes will be auto-reloaded")
     
     # Initial check and update
-    logger.info("Performing initial IP check and DNS update...")
+    log.info("Performing initial IP check and DNS update...")
     if not dns_updater.check_and_update():
-        logger.warning("Initial update had some failures, will retry in next cycle")
+        log.warning("Initial update had some failures, will retry in next cycle")
     
     # Main loop
-    logger.info(f"Starting monitoring loop (check interval: {config.check_interval} seconds)")
+    log.info("Starting monitoring loop (check interval: %s seconds)", config.check_interval)
     consecutive_failures = 0
-    config_check_counter = 0
     check_count = 0
+    # Without file notifications the config file is only stat'ed every POLL_INTERVAL
+    next_poll = time.monotonic() + config_watcher.POLL_INTERVAL
     
-    while not shutdown_requested:
+    while not shutdown.is_set():
         try:
-            # Wait for the check interval
-            for i in range(config.check_interval):
-                if shutdown_requested:
+            # Wait for the check interval (backs off while the IP is unchanged),
+            # waking early for shutdown or configuration changes
+            deadline = time.monotonic() + dns_updater.next_interval()
+            while not shutdown.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
                     break
-                time.sleep(1)
                 
-                # Check config file changes every 10 seconds
-                if i % 10 == 0 and config_path.exists():
-                    current_mtime = config_path.stat().st_mtime
-                    if current_mtime != config_mtime:
-                        logger.info("Configuration file changed, reloading...")
-                        try:
-                            new_config = config_manager.load()
-                            
-                            # Update components if config loaded successfully
-                            config = new_config
-                            config_mtime = current_mtime
-                            
-                            # Re-initialize API client if API key changed
-                            if api_client.api_key != config.api_key:
-                                logger.info("API key changed, re-initializing API client...")
-                                api_client = VultrAPIClient(config.api_key)
-                                if not api_client.test_connection():
-                                    logger.error("Failed to connect with new API key, keeping old configuration")
-                                    config = dns_updater.config  # Restore old config
-                                else:
-                                    logger.info("Successfully connected with new API key")
-                            
-                            # Update DNS updater config
-                            dns_updater.config = config
-                            logger.info(f"Configuration reloaded successfully. Managing {len(config.domains)} domain(s)")
-                            logger.info(f"New check interval: {config.check_interval} seconds")
-                            
-                        except Exception as e:
-                            logger.error(f"Failed to reload configuration: {e}")
-                            logger.warning("Continuing with previous configuration")
+                if not config_watcher.notifies:
+                    remaining = min(remaining, max(0.0, next_poll - time.monotonic()))
+                woken = runtime.wait_for_wakeup(remaining)
+                
+                poll_due = not config_watcher.notifies and time.monotonic() >= next_poll
+                if poll_due:
+                    next_poll = time.monotonic() + config_watcher.POLL_INTERVAL
+                
+                if not shutdown.is_set() and (woken or poll_due) and config_watcher.has_changed():
+                    log.info("Configuration file changed, reloading...")
+                    try:
+                        new_config = config_manager.load()
+                        key_changed = not hmac.compare_digest(
+                            new_config.api_key.encode('utf-8'), config.api_key.encode('utf-8')
+                        )
+                        
+                        if not key_changed and new_config == config:
+                            log.info("Configuration content unchanged")
+                            continue
+                        
+                        # Re-initialize API client only if API key changed
+                        if key_changed:
+                            log.info("API key changed, re-initializing API client...")
+                            new_client = VultrAPIClient(new_config.api_key)
+                            if not new_client.test_connection():
+                                log.error("Failed to connect with new API key, keeping old configuration")
+                                continue
+                            log.info("Successfully connected with new API key")
+                            api_client = dns_updater.api_client = new_client
+                        
+                        # Update DNS updater config
+                        config = dns_updater.config = new_config
+                        runtime.config, runtime.api = config, api_client
+                        log.info("Configuration reloaded successfully. Managing %s domain(s)", len(config.domains))
+                        log.info("New check interval: %s seconds", config.check_interval)
+                        
+                    except Exception as e:
+                        log.error("Failed to reload configuration: %s", e)
+                        log.warning("Continuing with previous configuration")
             
-            if shutdown_requested:
+            if shutdown.is_set():
                 break
             
             # Check and update
             check_count += 1
-            logger.info(f"Performing scheduled check #{check_count} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+            log.info("Performing scheduled check #%d", check_count)
             if dns_updater.check_and_update():
                 consecutive_failures = 0
             else:
                 consecutive_failures += 1
-                logger.warning(f"Update failed (consecutive failures: {consecutive_failures})")
+                log.warning("Update failed (consecutive failures: %s)", consecutive_failures)
                 
                 # If too many consecutive failures, wait longer before retry
                 if consecutive_failures >= config.max_retries:
-                    logger.error(f"Max consecutive failures reached ({config.max_retries}), waiting {config.retry_interval} seconds...")
-                    time.sleep(config.retry_interval)
+                    log.error("Max consecutive failures reached (%s), waiting %s seconds...", config.max_retries, config.retry_interval)
+                    runtime.wait_for_shutdown(config.retry_interval)
                     consecutive_failures = 0
             
         except KeyboardInterrupt:
-            logger.info("Keyboard interrupt received")
-            shutdown_requested = True
+            log.info("Keyboard interrupt received")
+            shutdown.set()
             break
         except Exception as e:
-            logger.exception(f"Unexpected error in main loop: {e}")
+            log.exception("Unexpected error in main loop: %s", e)
             consecutive_failures += 1
             
             if consecutive_failures >= config.max_retries:
-                logger.error(f"Too many errors, waiting {config.retry_interval} seconds before retry...")
-                time.sleep(config.retry_interval)
+                log.error("Too many errors, waiting %s seconds before retry...", config.retry_interval)
+                runtime.wait_for_shutdown(config.retry_interval)
                 consecutive_failures = 0
     
-    logger.info("VULTR Dynamic DNS Updater stopped")
+    config_watcher.stop()
+    log.info("VULTR Dynamic DNS Updater stopped")
 
 
-def run_once(config_manager: ConfigManager, force: bool = False):
-    """Run a single update check"""
+def run_once(config_manager: ConfigManager, runtime: Runtime, force: bool = False, repeat: int = 1):
+    """
+    Run a single update check
+    With `repeat`, the check runs that many times in this process, check_interval
+    seconds apart, reusing the API connection.
+    """
     logger.info("Running single update check")
     
-    # Load configuration
+    # Load configuration and initialize components
     try:
-        config = config_manager.load()
+        build_runtime(config_manager, runtime)
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
         sys.exit(1)
-    
-    # Initialize components
-    api_client = VultrAPIClient(config.api_key)
-    ip_monitor = IPMonitor()
-    dns_updater = DNSUpdater(config, api_client, ip_monitor)
+    dns_updater = runtime.updater
     
     # Test API connection
-    if not api_client.test_connection():
+    if not runtime.api.test_connection():
         logger.error("Failed to connect to VULTR API")
         sys.exit(1)
     
-    if force:
-        logger.info("Forcing DNS update...")
-        results = dns_updater.force_update()
-        for result in results:
-            print(str(result))
-    else:
-        logger.info("Checking for IP changes...")
-        if dns_updater.check_and_update():
-            logger.info("Update completed successfully")
+    failed = False
+    for run in range(repeat):
+        if run:
+            runtime.wait_for_shutdown(runtime.config.check_interval)
+            if runtime.shutdown.is_set():
+                break
+        
+        if force:
+            logger.info("Forcing DNS update...")
+            results = dns_updater.force_update()
+            for result in results:
+                print(str(result))
         else:
-            logger.error("Update failed")
-            sys.exit(1)
+            logger.info("Checking for IP changes...")
+            if dns_updater.check_and_update():
+                logger.info("Update completed successfully")
+            else:
+                logger.error("Update failed")
+                failed = True
+    
+    if failed:
+        sys.exit(1)
 
 
-def verify_dns(config_manager: ConfigManager):
+def verify_dns(config_manager: ConfigManager, runtime: Runtime):
     """Verify current DNS records"""
     logger.info("Verifying DNS records")
     
-    # Load configuration
+    # Load configuration and initialize components
     try:
-        config = config_manager.load()
+        build_runtime(config_manager, runtime)
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
         sys.exit(1)
     
-    # Initialize components
-    api_client = VultrAPIClient(config.api_key)
-    ip_monitor = IPMonitor()
-    dns_updater = DNSUpdater(config, api_client, ip_monitor)
-    
     # Get current IP
-    current_ip = ip_monitor.get_public_ip()
+    current_ip = runtime.ip_monitor.get_public_ip(runtime.updater.ip_version)
     print(f"\nCurrent public IP: {current_ip}")
     
     # Verify DNS records
     print("\nDNS Records:")
     print("-" * 50)
     
-    results = dns_updater.verify_dns_records()
+    results = runtime.updater.verify_dns_records()
     for result in results:
         if result['exists']:
             status = "✓" if result.get('current_ip') == current_ip else "✗"
@@ -247,6 +366,17 @@ def verify_dns(config_manager: ConfigManager):
             print(f"✗ {result['domain']}: {result.get('error', 'Not found')}")
 
 
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def main():
     """Main entry point"""
     parser = argparse.ArgumentParser(description='VULTR Dynamic DNS Updater')
@@ -263,6 +393,8 @@ def main():
     # Run once mode
     once_parser = subparsers.add_parser('once', help='Run single update check')
     once_parser.add_argument('--force', action='store_true', help='Force update even if IP unchanged')
+    once_parser.add_argument('--repeat', type=positive_int, default=1, metavar='N',
+                            help='Run N checks, check_interval seconds apart, reusing the connection')
     
     # Verify mode
     verify_parser = subparsers.add_parser('verify', help='Verify current DNS records')
@@ -274,12 +406,10 @@ def main():
     
     # Setup logging
     setup_logging(args.log_level, args.log_file)
-    global logger
-    logger = logging.getLogger(__name__)
     
     # Setup signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    runtime = Runtime()
+    runtime.install_signal_handlers()
     
     # Initialize config manager
     config_manager = ConfigManager(args.config)
@@ -290,11 +420,11 @@ def main():
     if command == 'init':
         config_manager.create_sample_config()
     elif command == 'verify':
-        verify_dns(config_manager)
+        verify_dns(config_manager, runtime)
     elif command == 'once':
-        run_once(config_manager, args.force)
+        run_once(config_manager, runtime, args.force, args.repeat)
     else:  # daemon
-        run_daemon(config_manager)
+        run_daemon(config_manager, runtime)
 
 
 if __name__ == '__main__':
@@ -2,14 +2,78 @@
 VULTR API Client for DNS management
 """
 import requests
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterator
 import logging
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+try:
+    import orjson
+except ImportError:  # Optional speedup; stdlib json is used otherwise
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# Marks an `existing_record` argument the caller did not look up
+NOT_FETCHED = object()
+
+# First number following "TTL" in a Vultr error message, e.g. the allowed value
+_TTL_IN_ERROR = re.compile(r'TTL\D*?(\d{2,6})')
+
+
+def _normalize_name(name: str) -> str:
+    """Normalize a record name for matching: case-insensitive, no trailing dot"""
+    return (name or '').lower().rstrip('.')
+
+
+# Seconds a successful getaddrinfo result for a cached host is reused
+RESOLVER_CACHE_TTL = 300.0
+
+_resolver_lock = threading.Lock()
+_resolver_hosts = set()
+# (host, port, family, type, proto, flags) -> (expires_at, addresses)
+_resolver_cache: Dict[tuple, Tuple[float, list]] = {}
+_system_getaddrinfo = None
+
 
-@dataclass
+def _install_resolver_cache(host: str) -> None:
+    """
+    Cache getaddrinfo results for `host` process-wide, so reconnects after a
+    keep-alive timeout skip the resolver. Other hosts resolve as before.
+    """
+    global _system_getaddrinfo
+    with _resolver_lock:
+        _resolver_hosts.add(host)
+        if _system_getaddrinfo is None:
+            _system_getaddrinfo = socket.getaddrinfo
+            socket.getaddrinfo = _cached_getaddrinfo
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """socket.getaddrinfo replacement; only successful lookups are cached"""
+    if host not in _resolver_hosts:
+        return _system_getaddrinfo(host, port, family, type, proto, flags)
+    
+    key = (host, port, family, type, proto, flags)
+    with _resolver_lock:
+        cached = _resolver_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    addresses = _system_getaddrinfo(host, port, family, type, proto, flags)
+    with _resolver_lock:
+        _resolver_cache[key] = (time.monotonic() + RESOLVER_CACHE_TTL, addresses)
+    return addresses
+
+
+@dataclass(slots=True)
 class DNSRecord:
     """DNS Record representation"""
     id: str
@@ -22,13 +86,14 @@ class DNSRecord:
     @classmethod
     def from_api_response(cls, data: Dict[str, Any]) -> 'DNSRecord':
         """Create DNSRecord from API response"""
+        g = data.get
         return cls(
-            id=data['id'],
-            type=data['type'],
-            name=data['name'],
-            data=data['data'],
-            ttl=data['ttl'],
-            priority=data.get('priority')
+            id=g('id'),
+            type=g('type'),
+            name=g('name'),
+            data=g('data'),
+            ttl=g('ttl'),
+            priority=g('priority')
         )
 
 
@@ -37,30 +102,107 @@ class VultrAPIError(Exception):
     pass
 
 
+class RateLimiter:
+    """Thread-safe token bucket allowing `rate` requests per second"""
+    
+    def __init__(self, rate: float, burst: int = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
 class VultrAPIClient:
     """VULTR API Client for DNS operations"""
     
     BASE_URL = "https://api.vultr.com/v2"
+    # VULTR allows 30 API requests per second per key
+    RATE_LIMIT = 30
+    # Records requested per page when listing (VULTR maximum is 500)
+    RECORDS_PER_PAGE = 500
+    # How long (seconds) a record listing is reused before asking the API again
+    RECORDS_CACHE_TTL = 30.0
+    # Concurrent writes in bulk_update_or_create (within the pooled connections)
+    BULK_MAX_WORKERS = 8
     
     def __init__(self, api_key: str):
         self.api_key = api_key
+        _install_resolver_cache(urlsplit(self.BASE_URL).hostname)
+        self.rate_limiter = RateLimiter(self.RATE_LIMIT)
         self.session = requests.Session()
+        # One keep-alive pool for api.vultr.com, with backoff on throttling and server errors.
+        # POST is not retried: a create that failed server-side may still have succeeded.
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=16,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(['GET', 'PATCH', 'DELETE']),
+                raise_on_status=False
+            )
+        )
+        self.session.mount('https://', adapter)
+        # Writes pass json=, which sets Content-Type per request
         self.session.headers.update({
             'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip, deflate',
+            'User-Agent': 'VultrDDNS/1.0'
         })
+        # domain -> (ETag, records) of the last record listing
+        self._etag_by_domain: Dict[str, Tuple[str, List[DNSRecord]]] = {}
+        # domain -> (fetched_at, records, {(type, name): record}), reused for RECORDS_CACHE_TTL seconds
+        self._records_cache: Dict[str, Tuple[float, List[DNSRecord], Dict[Tuple[str, str], DNSRecord]]] = {}
+        # Monotonic time of the last successful request, proving the API key works
+        self._last_ok: Optional[float] = None
     
     def _request(self, method: str, endpoint: str, **kwargs) -> Dict[str, Any]:
         """Make API request"""
+        return self._parse_json(self._send(method, endpoint, **kwargs))
+    
+    @staticmethod
+    def _parse_json(response: requests.Response) -> Dict[str, Any]:
+        """Decode a response body, skipping the parser for empty responses"""
+        if response.status_code == 204 or not response.content:
+            return {}
+        try:
+            if orjson is not None:
+                return orjson.loads(response.content)
+            return response.json()
+        except ValueError as e:
+            # e.g. a captive portal or proxy page answering with HTML
+            error_msg = f"Invalid JSON in VULTR API response: {e}"
+            logger.error(error_msg)
+            raise VultrAPIError(error_msg)
+    
+    def _send(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """Make API request and return the raw response"""
         url = f"{self.BASE_URL}{endpoint}"
         
         try:
+            self.rate_limiter.acquire()
             response = self.session.request(method, url, **kwargs)
             response.raise_for_status()
-            
-            if response.content:
-                return response.json()
-            return {}
+            self._last_ok = time.monotonic()
+            return response
             
         except requests.exceptions.HTTPError as e:
             error_msg = f"VULTR API error: {e}"
@@ -87,10 +229,104 @@ class VultrAPIClient:
         return self._request('GET', f'/domains/{domain}')
     
     def list_dns_records(self, domain: str) -> List[DNSRecord]:
-        """List all DNS records for a domain"""
-        response = self._request('GET', f'/domains/{domain}/records')
-        records = response.get('records', [])
-        return [DNSRecord.from_api_response(r) for r in records]
+        """
+        List all DNS records for a domain
+        A listing is reused for RECORDS_CACHE_TTL seconds and dropped when this
+        client changes the domain's records.
+        """
+        return list(self._cached_records(domain)[0])
+    
+    def _cached_records(self, domain: str) -> Tuple[List[DNSRecord], Dict[Tuple[str, str], DNSRecord]]:
+        """Return a domain's (records, index by (type, name)), refetching once stale"""
+        cached = self._records_cache.get(domain)
+        if cached and time.monotonic() - cached[0] < self.RECORDS_CACHE_TTL:
+            return cached[1], cached[2]
+        
+        records = self._fetch_dns_records(domain)
+        index: Dict[Tuple[str, str], DNSRecord] = {}
+        for record in records:
+            # Keep the first record per (type, name), as a linear scan would
+            index.setdefault((record.type, _normalize_name(record.name)), record)
+        
+        self._records_cache[domain] = (time.monotonic(), records, index)
+        return records, index
+    
+    def _fetch_dns_records(self, domain: str) -> List[DNSRecord]:
+        """
+        Fetch all DNS records for a domain from the API
+        The request is conditional on the last listing's ETag, so an unchanged
+        zone answers 304 and the previous records are reused.
+        """
+        cached = self._etag_by_domain.get(domain)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        
+        response = self._get_records_page(domain, headers=headers)
+        if response.status_code == 304 and cached:
+            logger.debug("DNS records for %s not modified", domain)
+            return list(cached[1])
+        
+        page = self._parse_json(response)
+        ctor = DNSRecord.from_api_response
+        records = [ctor(r) for r in page.get('records', [])]
+        
+        cursor = self._next_cursor(page)
+        if cursor:
+            # Later pages can change without the first page's ETag changing
+            self._etag_by_domain.pop(domain, None)
+            for page in self._iter_record_pages(domain, cursor):
+                records.extend([ctor(r) for r in page.get('records', [])])
+            return records
+        
+        etag = response.headers.get('ETag')
+        if etag:
+            self._etag_by_domain[domain] = (etag, records)
+        else:
+            self._etag_by_domain.pop(domain, None)
+        
+        return list(records)
+    
+    def iter_dns_records(self, domain: str,
+                         predicate: Optional[Callable[[DNSRecord], bool]] = None) -> Iterator[DNSRecord]:
+        """
+        Yield DNS records for a domain one page at a time
+        Only records matching `predicate` are yielded, so callers filtering a
+        large zone never hold the full listing and can stop early.
+        """
+        ctor = DNSRecord.from_api_response
+        for page in self._iter_record_pages(domain):
+            for data in page.get('records', []):
+                record = ctor(data)
+                if predicate is None or predicate(record):
+                    yield record
+    
+    def _get_records_page(self, domain: str, cursor: str = None,
+                          headers: Dict[str, str] = None) -> requests.Response:
+        """Request one page of a domain's DNS records"""
+        params = {'per_page': self.RECORDS_PER_PAGE}
+        if cursor:
+            params['cursor'] = cursor
+        return self._send('GET', f'/domains/{domain}/records', params=params, headers=headers or {})
+    
+    def _iter_record_pages(self, domain: str, cursor: str = None) -> Iterator[Dict[str, Any]]:
+        """Yield record list pages, starting at `cursor`, until the last page"""
+        while True:
+            response = self._get_records_page(domain, cursor)
+            page = self._parse_json(response)
+            yield page
+            
+            cursor = self._next_cursor(page)
+            if not cursor:
+                return
+    
+    def _invalidate_records(self, domain: str) -> None:
+        """Forget cached listings for a domain after changing its records"""
+        self._records_cache.pop(domain, None)
+        self._etag_by_domain.pop(domain, None)
+    
+    @staticmethod
+    def _next_cursor(page: Dict[str, Any]) -> Optional[str]:
+        """Cursor for the page after `page`, or None on the last page"""
+        return page.get('meta', {}).get('links', {}).get('next') or None
     
     def get_dns_record(self, domain: str, record_id: str) -> DNSRecord:
         """Get a specific DNS record"""
@@ -111,7 +347,8 @@ class VultrAPIClient:
             payload['priority'] = priority
         
         response = self._request('POST', f'/domains/{domain}/records', json=payload)
-        logger.info(f"Created DNS record: {name}.{domain} -> {data}")
+        self._invalidate_records(domain)
+        logger.info("Created DNS record: %s.%s -> %s", name, domain, data)
         return DNSRecord.from_api_response(response['record'])
     
     def update_dns_record(self, domain: str, record_id: str, 
@@ -134,43 +371,52 @@ class VultrAPIClient:
             return
         
         self._request('PATCH', f'/domains/{domain}/records/{record_id}', json=payload)
-        logger.info(f"Updated DNS record {record_id} for domain {domain}")
+        self._invalidate_records(domain)
+        logger.info("Updated DNS record %s for domain %s", record_id, domain)
     
     def delete_dns_record(self, domain: str, record_id: str) -> None:
         """Delete a DNS record"""
         self._request('DELETE', f'/domains/{domain}/records/{record_id}')
-        logger.info(f"Deleted DNS record {record_id} for domain {domain}")
+        self._invalidate_records(domain)
+        logger.info("Deleted DNS record %s for domain %s", record_id, domain)
     
     def find_dns_record(self, domain: str, subdomain: str, 
                        record_type: str = 'A') -> Optional[DNSRecord]:
         """Find a specific DNS record by subdomain and type"""
-        records = self.list_dns_records(domain)
+        _, index = self._cached_records(domain)
         
-        # Normalize subdomain for comparison - VULTR uses different formats
-        target_names = []
+        # Normalize subdomain for comparison - VULTR uses different formats.
+        # Case and trailing dots are normalized once here and in the index.
         if subdomain:
-            target_names = [subdomain, f"{subdomain}.{domain}", f"{subdomain}."]
+            candidates = (subdomain, f"{subdomain}.{domain}")
         else:
             # For root domain, VULTR typically uses empty string
-            target_names = ['', '@', domain, f"{domain}."]
+            candidates = ('', '@', domain)
+        target_names = tuple(dict.fromkeys(_normalize_name(n) for n in candidates))
         
-        logger.debug(f"Searching for DNS record: domain={domain}, subdomain='{subdomain}', type={record_type}")
-        logger.debug(f"Target names to match: {target_names}")
+        logger.debug("Searching for DNS record: domain=%s, subdomain='%s', type=%s", domain, subdomain, record_type)
+        logger.debug("Target names to match: %s", target_names)
         
-        for record in records:
-            logger.debug(f"Checking record: name='{record.name}', type={record.type}, data={record.data}")
-            if record.type == record_type and record.name in target_names:
-                logger.info(f"Found existing record: {record.name} -> {record.data} (ID: {record.id})")
+        for name in target_names:
+            record = index.get((record_type, name))
+            if record:
+                logger.info("Found existing record: %s -> %s (ID: %s)", record.name, record.data, record.id)
                 return record
         
-        logger.info(f"No existing record found for {subdomain or '@'}.{domain} ({record_type})")
+        logger.info("No existing record found for %s.%s (%s)", subdomain or '@', domain, record_type)
         return None
     
     def update_or_create_dns_record(self, domain: str, subdomain: str, 
                                    ip_address: str, record_type: str = 'A', 
-                                   ttl: int = 300) -> None:
-        """Update existing DNS record or create new one"""
-        existing_record = self.find_dns_record(domain, subdomain, record_type)
+                                   ttl: int = 300,
+                                   existing_record: Optional[DNSRecord] = NOT_FETCHED) -> None:
+        """
+        Update existing DNS record or create new one
+        Pass `existing_record` (None if known not to exist) when the caller has
+        already looked it up, to skip fetching the record list again.
+        """
+        if existing_record is NOT_FETCHED:
+            existing_record = self.find_dns_record(domain, subdomain, record_type)
         
         # Normalize subdomain
         name = subdomain if subdomain else '@'
@@ -180,12 +426,12 @@ class VultrAPIClient:
                 # Use existing record's TTL if updating
                 effective_ttl = existing_record.ttl
                 if ttl != existing_record.ttl:
-                    logger.info(f"Using existing TTL {existing_record.ttl} instead of configured {ttl} for {name}.{domain}")
+                    logger.info("Using existing TTL %s instead of configured %s for %s.%s", existing_record.ttl, ttl, name, domain)
                 
                 self.update_dns_record(domain, existing_record.id, data=ip_address)
-                logger.info(f"Updated {name}.{domain}: {existing_record.data} -> {ip_address} (TTL: {effective_ttl})")
+                logger.info("Updated %s.%s: %s -> %s (TTL: %s)", name, domain, existing_record.data, ip_address, effective_ttl)
             else:
-                logger.debug(f"No update needed for {name}.{domain} (IP unchanged: {ip_address})")
+                logger.debug("No update needed for %s.%s (IP unchanged: %s)", name, domain, ip_address)
         else:
             # For new records, check if there are other records with different TTL
             try:
@@ -194,42 +440,69 @@ class VultrAPIClient:
                     # Use the TTL from the first existing record to maintain consistency
                     first_record_ttl = all_records[0].ttl
                     if ttl != first_record_ttl:
-                        logger.info(f"Using existing domain TTL {first_record_ttl} instead of configured {ttl} for new record {name}.{domain}")
+                        logger.info("Using existing domain TTL %s instead of configured %s for new record %s.%s", first_record_ttl, ttl, name, domain)
                         ttl = first_record_ttl
-                
-                self.create_dns_record(domain, name, record_type, ip_address, ttl)
-                logger.info(f"Created new record {name}.{domain} -> {ip_address} (TTL: {ttl})")
-                
             except VultrAPIError as e:
-                # If we can't get existing records, try with configured TTL first
-                # then retry with common TTL values if it fails
-                logger.warning(f"Could not check existing records for TTL consistency: {e}")
+                # Fall back to the configured TTL
+                logger.warning("Could not check existing records for TTL consistency: %s", e)
+            
+            try:
+                self.create_dns_record(domain, name, record_type, ip_address, ttl)
+                logger.info("Created new record %s.%s -> %s (TTL: %s)", name, domain, ip_address, ttl)
+            except VultrAPIError as ttl_error:
+                # Retry once with the TTL the error message asks for
+                match = _TTL_IN_ERROR.search(str(ttl_error))
+                if not match or int(match.group(1)) == ttl:
+                    raise
+                try_ttl = int(match.group(1))
+                logger.info("Retrying with TTL %s for %s.%s", try_ttl, name, domain)
+                self.create_dns_record(domain, name, record_type, ip_address, try_ttl)
+                logger.info("Created new record %s.%s -> %s (TTL: %s)", name, domain, ip_address, try_ttl)
+    
+    def bulk_update_or_create(self, items: List[Tuple[str, str, str, str, int, Optional[DNSRecord]]]) -> List[Optional[Exception]]:
+        """
+        Update or create many DNS records concurrently
+        Items are (domain, subdomain, ip_address, record_type, ttl, existing_record),
+        with `existing_record` as for update_or_create_dns_record. Records passed as
+        NOT_FETCHED are all looked up (one listing per domain) before any write,
+        since writes invalidate the listing cache.
+        Returns one entry per item: None on success, otherwise the exception raised.
+        """
+        if not items:
+            return []
+        
+        resolved = []
+        unlisted = set()  # Domains whose listing failed; their writes look up again
+        for domain, subdomain, ip_address, record_type, ttl, existing_record in items:
+            if existing_record is NOT_FETCHED and domain not in unlisted:
                 try:
-                    self.create_dns_record(domain, name, record_type, ip_address, ttl)
-                    logger.info(f"Created new record {name}.{domain} -> {ip_address} (TTL: {ttl})")
-                except VultrAPIError as ttl_error:
-                    if "TTL" in str(ttl_error):
-                        # Try common TTL values
-                        common_ttls = [3600, 1800, 7200, 300, 600]
-                        for try_ttl in common_ttls:
-                            if try_ttl != ttl:  # Don't retry the same TTL
-                                try:
-                                    logger.info(f"Retrying with TTL {try_ttl} for {name}.{domain}")
-                                    self.create_dns_record(domain, name, record_type, ip_address, try_ttl)
-                                    logger.info(f"Created new record {name}.{domain} -> {ip_address} (TTL: {try_ttl})")
-                                    return
-                                except VultrAPIError:
-                                    continue
-                    
-                    # If all attempts failed, re-raise the original error
-                    raise ttl_error
-    
-    def test_connection(self) -> bool:
-        """Test API connection and authentication"""
+                    existing_record = self.find_dns_record(domain, subdomain, record_type)
+                except VultrAPIError:
+                    unlisted.add(domain)
+            resolved.append((domain, subdomain, ip_address, record_type, ttl, existing_record))
+        
+        with ThreadPoolExecutor(max_workers=min(self.BULK_MAX_WORKERS, len(items))) as executor:
+            futures = [
+                executor.submit(
+                    self.update_or_create_dns_record, domain, subdomain, ip_address,
+                    record_type, ttl, existing_record=existing_record
+                )
+                for domain, subdomain, ip_address, record_type, ttl, existing_record in resolved
+            ]
+            return [future.exception() for future in futures]
+    
+    def test_connection(self, max_age: float = 300) -> bool:
+        """
+        Test API connection and authentication
+        Skipped when a request succeeded within the last `max_age` seconds.
+        """
+        if self._last_ok is not None and time.monotonic() - self._last_ok < max_age:
+            return True
+        
         try:
             account = self._request('GET', '/account')
-            logger.info(f"API connection successful. Account: {account.get('account', {}).get('email', 'Unknown')}")
+            logger.info("API connection successful. Account: %s", account.get('account', {}).get('email', 'Unknown'))
             return True
         except VultrAPIError as e:
-            logger.error(f"API connection failed: {e}")
+            logger.error("API connection failed: %s", e)
             return False
\ No newline at end of file